@@ -1,18 +1,26 @@
 from tools import files
 
 
-def compile_context(run, step: str, profile_name: str, events: list, context_profiles: dict) -> dict:
-    """compile context bundle with manifest and budget enforcement"""
-    
-    profile = context_profiles.get(profile_name, {"budget_tokens": 120000})
-    budget = profile.get("budget_tokens", 120000)
-    
-    # gather scratchpad (last 5 events' data)
-    recent_events = events[-5:] if len(events) > 5 else events
-    scratchpad = [{"step": e.get("step", ""), "type": e.get("type", ""), "data": e.get("data", {})} 
-                  for e in recent_events]
-    
-    # gather repo snippets (read key files)
+def _approx_len(obj) -> int:
+    """approximate len(str(obj)) without building the string"""
+    if isinstance(obj, str):
+        return len(obj) + 2  # quotes
+    if isinstance(obj, dict):
+        # braces, ': ' per item, ', ' between items
+        return sum(_approx_len(k) + _approx_len(v) + 4 for k, v in obj.items()) + (0 if obj else 2)
+    if isinstance(obj, (list, tuple)):
+        # brackets, ', ' between items
+        return sum(_approx_len(v) + 2 for v in obj) + (0 if obj else 2)
+    return len(repr(obj))
+
+
+def _estimate_tokens(obj) -> int:
+    """estimate tokens with the len/4 heuristic"""
+    return _approx_len(obj) // 4
+
+
+def read_repo_snippets() -> dict:
+    """read the key repo files included in every context bundle"""
     repo_snippets = {}
     try:
         app_content = files.read("app.py")
@@ -28,14 +36,32 @@ def compile_context(run, step: str, profile_name: str, events: list, context_pro
     except:
         pass
     
+    return repo_snippets
+
+
+def compile_context(run, step: str, profile_name: str, events: list, context_profiles: dict,
+                    repo_snippets: dict = None) -> dict:
+    """compile context bundle with manifest and budget enforcement"""
+    
+    profile = context_profiles.get(profile_name)
+    budget = profile.budget_tokens if profile else 120000
+    
+    # gather scratchpad (last 5 events' data)
+    scratchpad = [{"step": e.step, "type": e.type, "data": e.data} 
+                  for e in events[-5:]]
+    
+    # gather repo snippets (read key files) unless the caller already has them
+    if repo_snippets is None:
+        repo_snippets = read_repo_snippets()
+    
     # policy docs stub
     policy_docs = {"note": "policy enforcement active", "patterns_blocked": ["eval("]}
     
     # build sections and estimate tokens (len/4 heuristic)
     sections = {
-        "scratchpad": {"content": scratchpad, "token_estimate": len(str(scratchpad)) // 4},
-        "repo_snippets": {"content": repo_snippets, "token_estimate": len(str(repo_snippets)) // 4},
-        "policy_docs": {"content": policy_docs, "token_estimate": len(str(policy_docs)) // 4}
+        "scratchpad": {"content": scratchpad, "token_estimate": _estimate_tokens(scratchpad)},
+        "repo_snippets": {"content": repo_snippets, "token_estimate": sum(len(c) for c in repo_snippets.values()) // 4},
+        "policy_docs": {"content": policy_docs, "token_estimate": _estimate_tokens(policy_docs)}
     }
     
     total_tokens = sum(s["token_estimate"] for s in sections.values())
@@ -1,10 +1,17 @@
 import asyncio
 import json
+from dataclasses import dataclass
 from pathlib import Path
-from datetime import datetime
+import time
 from tools import files, tests, security
-from context import compile_context
+from context import compile_context, read_repo_snippets
 from routing import choose_model
+from models import Edge
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 # in-memory stores passed from app
@@ -14,6 +21,50 @@ _events = {}
 _context_profiles = {}
 _policies = {}
 
+# run_id -> (step, type) -> events, kept in sync by emit_event
+_event_index = {}
+
+# run_id -> open events.jsonl handle, closed when the run finishes
+_event_files = {}
+_run_dirs = set()
+
+# run_id -> repo snippets for context, dropped whenever a repo file is written
+_repo_snippets = {}
+
+# [epoch second, iso string] for the last formatted timestamp
+_ts_cache = [0, ""]
+
+
+def now_iso() -> str:
+    """current utc time as iso 8601, second-granular and formatted once per second"""
+    t = int(time.time())
+    if t != _ts_cache[0]:
+        _ts_cache[0] = t
+        _ts_cache[1] = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(t))
+    return _ts_cache[1]
+
+
+@dataclass(slots=True)
+class Event:
+    """run event, slotted to keep the most-allocated object in the engine small;
+    orjson serializes it directly
+    """
+    run_id: str
+    step: str
+    type: str
+    ts: str
+    data: dict
+    
+    def to_dict(self) -> dict:
+        """plain dict for the api and the stdlib json fallback"""
+        return {
+            "run_id": self.run_id,
+            "step": self.step,
+            "type": self.type,
+            "ts": self.ts,
+            "data": self.data
+        }
+
 
 def init_stores(runs, graphs, events, context_profiles, policies):
     """initialize references to app stores"""
@@ -25,49 +76,123 @@ def init_stores(runs, graphs, events, context_profiles, policies):
     _policies = policies
 
 
+def _dumps(obj, indent: bool = False) -> bytes:
+    """serialize to json bytes, using orjson when installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else None)
+    if isinstance(obj, Event):
+        obj = obj.to_dict()
+    return json.dumps(obj, indent=2 if indent else None).encode()
+
+
 def emit_event(run_id: str, step: str, event_type: str, data: dict):
     """emit event to memory and persist to disk"""
-    event = {
-        "run_id": run_id,
-        "step": step,
-        "type": event_type,
-        "ts": datetime.utcnow().isoformat(),
-        "data": data
-    }
+    event = Event(run_id, step, event_type, now_iso(), data)
     
     if run_id not in _events:
         _events[run_id] = []
     _events[run_id].append(event)
+    _event_index.setdefault(run_id, {}).setdefault((step, event_type), []).append(event)
     
-    # persist to disk
-    data_dir = Path("./data") / run_id
-    data_dir.mkdir(parents=True, exist_ok=True)
-    
-    with open(data_dir / "events.jsonl", "a") as f:
-        f.write(json.dumps(event) + "\n")
+    # persist to disk through an unbuffered handle kept open for the run,
+    # one write per event
+    f = _event_files.get(run_id)
+    if f is None:
+        f = _event_files[run_id] = open(_run_dir(run_id) / "events.jsonl", "ab", buffering=0)
+    f.write(_dumps(event) + b"\n")
     
     return event
 
 
-def save_artifact(run_id: str, name: str, content: str):
-    """save artifact to disk"""
+def _run_dir(run_id: str) -> Path:
+    """return the run's data dir, creating it on first use"""
     data_dir = Path("./data") / run_id
-    data_dir.mkdir(parents=True, exist_ok=True)
-    
-    with open(data_dir / name, "w") as f:
+    if run_id not in _run_dirs:
+        data_dir.mkdir(parents=True, exist_ok=True)
+        _run_dirs.add(run_id)
+    return data_dir
+
+
+def _close_event_file(run_id: str):
+    """close the run's events.jsonl handle if open"""
+    f = _event_files.pop(run_id, None)
+    if f is not None:
+        f.close()
+
+
+def _write_repo_file(path: str, content: str) -> dict:
+    """write a repo file and invalidate cached snippets of every run"""
+    result = files.write(path, content)
+    _repo_snippets.clear()
+    return result
+
+
+def save_artifact(run_id: str, name: str, content: str | bytes):
+    """save artifact to disk, writing bytes as-is"""
+    if isinstance(content, str):
+        content = content.encode()
+    with open(_run_dir(run_id) / name, "wb") as f:
         f.write(content)
 
 
+def compile_dag(dag: list[Edge]) -> dict:
+    """precompute adjacency, in-degrees, join groups and topo order for a dag
+    
+    the result is shared by every run of the graph and must not be mutated
+    """
+    adj = {}  # node -> list of outgoing edges
+    in_degree = {}  # node -> count of incoming edges
+    join_groups = {}  # join node -> list of source nodes
+    
+    for edge in dag:
+        from_node = edge.from_node
+        to_node = edge.to_node
+        
+        adj.setdefault(from_node, []).append(edge)
+        
+        in_degree[to_node] = in_degree.get(to_node, 0) + 1
+        in_degree.setdefault(from_node, 0)
+        
+        # track join nodes
+        if edge.join:
+            join_groups.setdefault(to_node, []).append(from_node)
+    
+    # kahn's algorithm, keeping insertion order for ties
+    remaining = dict(in_degree)
+    frontier = [n for n in in_degree if remaining[n] == 0]
+    topo_order = []
+    while frontier:
+        node = frontier.pop(0)
+        topo_order.append(node)
+        for edge in adj.get(node, []):
+            child = edge.to_node
+            remaining[child] -= 1
+            if remaining[child] == 0:
+                frontier.append(child)
+    
+    return {
+        "adj": adj,
+        "in_degree": in_degree,
+        "join_groups": join_groups,
+        "topo_order": topo_order
+    }
+
+
 async def run_node(run_id: str, node: str, run_events: list) -> dict:
     """execute a single node handler"""
     
-    # compile context
+    # compile context, reusing the run's repo snippets while files are unchanged
+    snippets = _repo_snippets.get(run_id)
+    if snippets is None:
+        snippets = _repo_snippets[run_id] = read_repo_snippets()
+    
     ctx = compile_context(
         _runs[run_id],
         node,
         "reviewer-default",
         run_events,
-        _context_profiles
+        _context_profiles,
+        repo_snippets=snippets
     )
     
     # choose model
@@ -95,9 +220,9 @@ async def run_node(run_id: str, node: str, run_events: list) -> dict:
         app_file = files.read("app.py")
         if "content" in app_file:
             fixed = app_file["content"].replace("return 41", "return 42")
-            files.write("app.py", fixed)
+            _write_repo_file("app.py", fixed)
             patch = {"file": "app.py", "change": "return 41 -> return 42"}
-            save_artifact(run_id, "py_fixer_patch.json", json.dumps(patch, indent=2))
+            save_artifact(run_id, "py_fixer_patch.json", _dumps(patch, indent=True))
             result = {"patch": patch, "success": True}
         else:
             result = {"error": "app.py not found"}
@@ -116,7 +241,7 @@ async def run_node(run_id: str, node: str, run_events: list) -> dict:
             if "assert answer == 42" not in content:
                 # add another assertion
                 content += "\n\ndef test_answer_type():\n    from app import compute\n    assert isinstance(compute(), int)\n"
-                files.write("tests/test_app.py", content)
+                _write_repo_file("tests/test_app.py", content)
                 result = {"added": "test_answer_type", "success": True}
             else:
                 result = {"message": "tests already complete"}
@@ -127,17 +252,16 @@ async def run_node(run_id: str, node: str, run_events: list) -> dict:
     elif node == "aggregator":
         # pick py_fixer patch if present
         patches = []
-        for e in run_events:
-            if e.get("step") == "py_fixer" and e.get("type") == "patch_created":
-                if e.get("data", {}).get("success"):
-                    patches.append(e["data"]["patch"])
+        for e in _event_index.get(run_id, {}).get(("py_fixer", "patch_created"), []):
+            if e.data.get("success"):
+                patches.append(e.data["patch"])
         
         result = {"selected_patch": patches[0] if patches else None}
         emit_event(run_id, node, "patch_selected", result)
     
     elif node == "tester":
         # run tests
-        test_result = tests.run()
+        test_result = await tests.run()
         result = test_result
         if test_result.get("passed"):
             emit_event(run_id, node, "tests_passed", result)
@@ -157,8 +281,8 @@ async def run_node(run_id: str, node: str, run_events: list) -> dict:
         # append to changelog
         changelog = files.read("CHANGELOG.md")
         content = changelog.get("content", "# Changelog\n\n")
-        content += f"\n- {datetime.utcnow().isoformat()}: auto-release from run {run_id}\n"
-        files.write("CHANGELOG.md", content)
+        content += f"\n- {now_iso()}: auto-release from run {run_id}\n"
+        _write_repo_file("CHANGELOG.md", content)
         result = {"released": True}
         emit_event(run_id, node, "release_complete", result)
     
@@ -172,6 +296,47 @@ async def run_node(run_id: str, node: str, run_events: list) -> dict:
     return result
 
 
+def _edge_fires(run_id: str, edge: Edge) -> bool:
+    """check an edge's `on` condition against the events its source emitted"""
+    if not edge.on:
+        return True
+    index = _event_index.get(run_id, {})
+    return any(index.get((edge.from_node, t)) for t in edge.on)
+
+
+def _layers(run_id: str, compiled: dict):
+    """yield layers of ready nodes, resolving edge conditions between layers
+    
+    the caller must finish running a layer before asking for the next one,
+    since `on` conditions depend on the events that layer emitted. a join
+    node waits for all of its join sources, any other node for one firing
+    edge.
+    """
+    adj = compiled["adj"]
+    join_groups = compiled["join_groups"]
+    fired = {}  # node -> sources whose edge into it fired
+    seen = set()
+    
+    layer = [n for n in compiled["topo_order"] if compiled["in_degree"][n] == 0]
+    while layer:
+        seen.update(layer)
+        yield layer
+        
+        next_layer = []
+        for node in layer:
+            for edge in adj.get(node, []):
+                child = edge.to_node
+                if child in seen or not _edge_fires(run_id, edge):
+                    continue
+                sources = fired.setdefault(child, set())
+                sources.add(node)
+                if child in next_layer:
+                    continue
+                if child not in join_groups or sources.issuperset(join_groups[child]):
+                    next_layer.append(child)
+        layer = next_layer
+
+
 async def execute_graph(run_id: str):
     """execute graph for a run with parallel fan-out and join support"""
     
@@ -179,119 +344,39 @@ async def execute_graph(run_id: str):
         run = _runs[run_id]
         graph = _graphs[run["graph"]]
         
-        run["status"] = "running"
-        emit_event(run_id, "system", "run_started", {"graph": graph["name"]})
+        # single event list shared by every node of the run
+        run_events = _events.setdefault(run_id, [])
         
-        # build adjacency map
-        adj = {}  # node -> list of outgoing edges
-        in_degree = {}  # node -> count of incoming edges
-        join_groups = {}  # join node -> list of source nodes
+        run["status"] = "running"
+        emit_event(run_id, "system", "run_started", {"graph": graph.name})
         
-        for edge in graph["dag"]:
-            from_node = edge["from_node"]
-            to_node = edge["to_node"]
-            
-            if from_node not in adj:
-                adj[from_node] = []
-            adj[from_node].append(edge)
-            
-            in_degree[to_node] = in_degree.get(to_node, 0) + 1
-            in_degree.setdefault(from_node, 0)
-            
-            # track join nodes
-            if edge.get("join"):
-                if to_node not in join_groups:
-                    join_groups[to_node] = []
-                join_groups[to_node].append(from_node)
+        # adjacency is compiled once at graph registration
+        compiled = graph._compiled or compile_dag(graph.dag)
+        completed = []
         
-        # find start nodes (in_degree == 0)
-        ready = [n for n in in_degree if in_degree[n] == 0]
-        completed = set()
-        completed_nodes = {}  # node -> result
-        
-        # execution loop
-        while ready:
-            # check for parallel edges from ready nodes
-            parallel_tasks = []
-            parallel_nodes = []
-            sequential_node = None
-            
-            for node in ready:
-                edges = adj.get(node, [])
-                if edges and edges[0].get("parallel"):
-                    # fan-out: run this node, then its children in parallel
-                    if node not in completed:
-                        result = await run_node(run_id, node, _events.get(run_id, []))
-                        completed.add(node)
-                        completed_nodes[node] = result
-                    
-                    # schedule parallel children
-                    for edge in edges:
-                        child = edge["to_node"]
-                        parallel_tasks.append(run_node(run_id, child, _events.get(run_id, [])))
-                        parallel_nodes.append(child)
-                else:
-                    sequential_node = node
-                    break
-            
-            # execute parallel tasks if any
-            if parallel_tasks:
-                results = await asyncio.gather(*parallel_tasks)
-                for node, result in zip(parallel_nodes, results):
-                    completed.add(node)
-                    completed_nodes[node] = result
-                
-                # remove parallel nodes from ready
-                ready = [n for n in ready if n not in parallel_nodes and n not in completed]
-                
-                # check join nodes
-                for join_node, sources in join_groups.items():
-                    if all(s in completed for s in sources):
-                        if join_node not in completed:
-                            ready.append(join_node)
-            
-            elif sequential_node:
-                # run sequential node
-                if sequential_node not in completed:
-                    result = await run_node(run_id, sequential_node, _events.get(run_id, []))
-                    completed.add(sequential_node)
-                    completed_nodes[sequential_node] = result
-                
-                ready.remove(sequential_node)
-                
-                # add children to ready based on edge conditions
-                for edge in adj.get(sequential_node, []):
-                    child = edge["to_node"]
-                    
-                    # check edge conditions
-                    if edge.get("on"):
-                        # check if any of the required event types were emitted
-                        events = _events.get(run_id, [])
-                        matches = any(
-                            e.get("step") == sequential_node and e.get("type") in edge["on"]
-                            for e in events
-                        )
-                        if not matches:
-                            continue
-                    
-                    # check if all incoming edges are complete
-                    if child in join_groups:
-                        if all(s in completed for s in join_groups[child]):
-                            if child not in ready and child not in completed:
-                                ready.append(child)
-                    else:
-                        if child not in ready and child not in completed:
-                            ready.append(child)
-            else:
-                break
+        # run each layer of ready nodes concurrently; siblings finish before
+        # the first failure is re-raised
+        for layer in _layers(run_id, compiled):
+            results = await asyncio.gather(
+                *(run_node(run_id, node, run_events) for node in layer),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+            completed.extend(layer)
         
         run["status"] = "succeeded"
-        emit_event(run_id, "system", "run_completed", {"completed_nodes": list(completed)})
+        emit_event(run_id, "system", "run_completed", {"completed_nodes": completed})
     
     except Exception as e:
         run["status"] = "failed"
         emit_event(run_id, "system", "run_failed", {"error": str(e)})
         raise
+    
+    finally:
+        _close_event_file(run_id)
+        _repo_snippets.pop(run_id, None)
 
 
 async def replay_from(run_id: str, from_step: str) -> str:
@@ -306,7 +391,7 @@ async def replay_from(run_id: str, from_step: str) -> str:
         "graph": original_run["graph"],
         "inputs": original_run["inputs"],
         "status": "pending",
-        "created_at": datetime.utcnow().isoformat(),
+        "created_at": now_iso(),
         "parent_run": run_id
     }
     _runs[new_run_id] = new_run
@@ -317,12 +402,15 @@ async def replay_from(run_id: str, from_step: str) -> str:
     
     found_step = False
     for event in original_events:
-        if event["step"] == from_step:
+        if event.step == from_step:
             found_step = True
             break
         new_events.append(event)
     
     _events[new_run_id] = new_events
+    index = _event_index[new_run_id] = {}
+    for event in new_events:
+        index.setdefault((event.step, event.type), []).append(event)
     
     # execute from from_step
     await execute_graph(new_run_id)
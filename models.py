@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict
 from typing import Optional
 
 
@@ -11,12 +11,17 @@ class AgentClass(BaseModel):
 
 
 class Policy(BaseModel):
+    # registry entries are read by every concurrent run
+    model_config = ConfigDict(frozen=True)
+    
     name: str
     max_cost_usd: float = 5.0
     block_patterns: list[str] = []
 
 
 class ContextProfile(BaseModel):
+    model_config = ConfigDict(frozen=True)
+    
     name: str
     budget_tokens: int = 120000
     mounts: list[str] = []
@@ -31,6 +36,9 @@ class ProviderPool(BaseModel):
 
 
 class Edge(BaseModel):
+    # compiled dags share these edges across runs
+    model_config = ConfigDict(frozen=True)
+    
     from_node: str
     to_node: str
     on: list[str] = []
@@ -43,6 +51,9 @@ class Graph(BaseModel):
     agents: list[str] = []
     dag: list[Edge] = []
     policy_name: Optional[str] = None
+    
+    # derived by engine.compile_dag at registration, not part of the api shape
+    _compiled: Optional[dict] = None
 
 
 class Run(BaseModel):
@@ -53,11 +64,3 @@ class Run(BaseModel):
     created_at: str
     parent_run: Optional[str] = None
 
-
-class Event(BaseModel):
-    run_id: str
-    step: str
-    type: str
-    ts: str
-    data: dict = {}
-
@@ -2,35 +2,49 @@ import os
 from pathlib import Path
 
 # safe root for all file operations
-SAFE_ROOT = Path(__file__).parent.parent / "examples" / "sample_repo"
+SAFE_ROOT = (Path(__file__).parent.parent / "examples" / "sample_repo").resolve()
 
+# path -> (mtime_ns, size, content) for unchanged-file reads
+_cache: dict[str, tuple[int, int, str]] = {}
 
-def read(path: str) -> dict:
-    """read file from safe root"""
+
+def _resolve(path: str) -> Path:
+    """resolve path under safe root, rejecting anything outside it"""
     full_path = (SAFE_ROOT / path).resolve()
-    if not str(full_path).startswith(str(SAFE_ROOT)):
+    # commonpath, unlike a string prefix check, rejects siblings like sample_repo_evil
+    if os.path.commonpath([str(full_path), str(SAFE_ROOT)]) != str(SAFE_ROOT):
         raise ValueError(f"path {path} escapes safe root")
+    return full_path
+
+
+def read(path: str) -> dict:
+    """read file from safe root"""
+    full_path = _resolve(path)
     
-    if not full_path.exists():
+    try:
+        st = full_path.stat()
+    except FileNotFoundError:
+        _cache.pop(str(full_path), None)
         return {"error": f"file not found: {path}"}
     
-    with open(full_path, "r") as f:
-        content = f.read()
+    # serve from cache while mtime and size are unchanged
+    cached = _cache.get(str(full_path))
+    if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return {"content": cached[2], "path": str(path)}
     
+    content = full_path.read_text()
+    _cache[str(full_path)] = (st.st_mtime_ns, st.st_size, content)
     return {"content": content, "path": str(path)}
 
 
 def write(path: str, content: str) -> dict:
     """write file to safe root"""
-    full_path = (SAFE_ROOT / path).resolve()
-    if not str(full_path).startswith(str(SAFE_ROOT)):
-        raise ValueError(f"path {path} escapes safe root")
+    full_path = _resolve(path)
     
     # ensure parent directory exists
     full_path.parent.mkdir(parents=True, exist_ok=True)
     
-    with open(full_path, "w") as f:
-        f.write(content)
+    _cache.pop(str(full_path), None)
+    full_path.write_text(content)
     
     return {"ok": True, "path": str(path), "bytes": len(content)}
-
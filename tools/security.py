@@ -1,5 +1,43 @@
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# sorted pattern tuple -> automaton, built once per pattern set
+_automata = {}
+
+
+def _automaton(block_patterns: list[str]):
+    """get or build the multi-pattern matcher for a pattern set
+    
+    empty patterns are left out since the automaton cannot hold them;
+    returns None when no non-empty pattern remains
+    """
+    key = tuple(sorted(set(p for p in block_patterns if p)))
+    if not key:
+        return None
+    automaton = _automata.get(key)
+    if automaton is None:
+        automaton = ahocorasick.Automaton()
+        for pattern in key:
+            automaton.add_word(pattern, pattern)
+        automaton.make_automaton()
+        _automata[key] = automaton
+    return automaton
+
+
 def scan_text(text: str, block_patterns: list[str]) -> dict:
     """scan text for blocked patterns"""
+    if ahocorasick is not None and block_patterns:
+        # single pass over text for all patterns, then report the first
+        # match in policy order; an empty pattern always matches
+        automaton = _automaton(block_patterns)
+        found = {p for _, p in automaton.iter(text)} if automaton else set()
+        for pattern in block_patterns:
+            if not pattern or pattern in found:
+                return {"error": f"blocked pattern found: {pattern}"}
+        return {"ok": True}
+    
     for pattern in block_patterns:
         if pattern in text:
             return {"error": f"blocked pattern found: {pattern}"}
@@ -10,4 +48,3 @@ def scan_repo() -> dict:
     """scan entire repo for security issues (stub)"""
     # always ok for demo
     return {"ok": True, "issues": []}
-
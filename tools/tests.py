@@ -1,35 +1,80 @@
-import subprocess
+import asyncio
+import hashlib
 import sys
 from pathlib import Path
 
 REPO_ROOT = Path(__file__).parent.parent / "examples" / "sample_repo"
 
+# hash of the last successfully installed requirements.txt
+DEPS_HASH_FILE = REPO_ROOT / ".deps_hash"
 
-def run() -> dict:
-    """run pytest in sample repo and return summary"""
-    # install deps if requirements.txt exists
+
+# (loop, lock) serializing dep installs across concurrent runs; rebuilt
+# when the app starts again on a new event loop
+_deps_lock = None
+
+
+def _get_deps_lock() -> asyncio.Lock:
+    """return the deps lock for the running event loop"""
+    global _deps_lock
+    loop = asyncio.get_running_loop()
+    if _deps_lock is None or _deps_lock[0] is not loop:
+        _deps_lock = (loop, asyncio.Lock())
+    return _deps_lock[1]
+
+
+def _deps_digest(req_file: Path) -> str:
+    """hash requirements.txt, keyed on the interpreter so a different venv reinstalls"""
+    return hashlib.sha256(sys.executable.encode() + b"\0" + req_file.read_bytes()).hexdigest()
+
+
+def _deps_current(digest: str) -> bool:
+    """check whether the last successful install matches digest"""
+    return DEPS_HASH_FILE.exists() and DEPS_HASH_FILE.read_text() == digest
+
+
+async def _install_deps():
+    """pip install requirements.txt if it changed since the last install"""
     req_file = REPO_ROOT / "requirements.txt"
-    if req_file.exists():
+    if not req_file.exists() or _deps_current(_deps_digest(req_file)):
+        return
+    
+    # only one run installs at a time; re-check since another run may have
+    # finished the install while we waited
+    async with _get_deps_lock():
+        digest = _deps_digest(req_file)
+        if _deps_current(digest):
+            return
         try:
-            subprocess.run(
-                [sys.executable, "-m", "pip", "install", "-q", "-r", str(req_file)],
-                check=True,
-                capture_output=True,
+            proc = await asyncio.create_subprocess_exec(
+                sys.executable, "-m", "pip", "install", "-q", "-r", str(req_file),
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL,
                 cwd=REPO_ROOT
             )
-        except subprocess.CalledProcessError:
+            if await proc.wait() == 0:
+                DEPS_HASH_FILE.write_text(digest)
+        except OSError:
             pass  # continue anyway
+
+
+async def run() -> dict:
+    """run pytest in sample repo and return summary"""
+    await _install_deps()
     
-    # run pytest
+    # run pytest in a fresh interpreter (the sample repo's `app` module would
+    # collide with ours in-process); plugins stay enabled since the repo's
+    # installed deps may provide them, only the cache provider is skipped
     try:
-        result = subprocess.run(
-            [sys.executable, "-m", "pytest", "-v", "--tb=short"],
-            capture_output=True,
-            text=True,
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "pytest", "-v", "--tb=short", "-p", "no:cacheprovider",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
             cwd=REPO_ROOT
         )
-        output = result.stdout + result.stderr
-        passed = result.returncode == 0
+        out, _ = await proc.communicate()
+        output = out.decode(errors="replace")
+        passed = proc.returncode == 0
         
         # limit output to last 2000 chars
         if len(output) > 2000:
@@ -38,4 +83,3 @@ def run() -> dict:
         return {"passed": passed, "output": output}
     except Exception as e:
         return {"passed": False, "output": f"error running pytest: {str(e)}"}
-